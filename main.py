@@ -1,18 +1,27 @@
-import json
+import os
+import re
+import string
+import tempfile
 import time
 import threading
-import queue
 import logging
-from logging.handlers import RotatingFileHandler
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import queue
 from pathlib import Path
 import urllib.parse
+import io
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
 
-import win32com.client
-import pythoncom
 import requests
+from requests.adapters import HTTPAdapter
 from pypresence import Presence
-import pystray
-from PIL import Image, ImageDraw
 
 DEFAULT_CLIENT_ID = "1459800355243163846"
 FALLBACK_IMAGE = "itunes_logo"
@@ -21,11 +30,28 @@ CONFIG_PATH = ROOT_PATH / "config.json"
 ARTWORK_CACHE_PATH = ROOT_PATH / "artwork_cache.json"
 LOG_PATH = ROOT_PATH / "app.log"
 
+ARTWORK_CACHE_FLUSH_INTERVAL = 30
+MIN_WAIT_INTERVAL = 0.1
+MENU_TRACK_TTL = 10
+# HRESULTs meaning the iTunes COM server is gone and the dispatch must be recreated.
+DEAD_DISPATCH_HRESULTS = {
+    -2147023174,  # RPC_S_SERVER_UNAVAILABLE (0x800706BA)
+    -2147417848,  # RPC_E_DISCONNECTED (0x80010108)
+    -2147023170,  # RPC_S_CALL_FAILED (0x800706BE)
+    -2146959355,  # CO_E_SERVER_EXEC_FAILURE (0x80080005)
+}
+PRESENCE_RESEND_INTERVAL = 15
+SEEK_TOLERANCE = 3
+ARTWORK_NEGATIVE_TTL = 86400
+PLAY_COUNTS_MAX = 1000
+NON_ALNUM_RE = re.compile(r"[\W_]+")
+
 
 DEFAULT_CONFIG = {
     "client_id": DEFAULT_CLIENT_ID,
     "refresh_interval": 3,
     "idle_interval": 2,
+    "event_fallback_interval": 30,
     "request_timeout": 5,
     "max_retry": 3,
     "retry_backoff": 1.5,
@@ -53,11 +79,80 @@ DEFAULT_CONFIG = {
     ],
 }
 
+# 64x64 black/white checker tray icon, pre-rendered so startup skips ImageDraw.
+ICON_PNG = (
+    b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00@\x00\x00\x00@\x08\x02"
+    b"\x00\x00\x00%\x0b\xe6\x89\x00\x00\x00VIDATx\xda\xed\xd1\xc1\t\x00@\x08"
+    b"\x04\xb1\xed\xbfi-\xe0^\xf7P\x102\x1d\x84I\x86\xab\xe1\x02\x00\x00\x00"
+    b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\xf0\r\xa8\xe3m\x00n/\x06\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00"
+    b"\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00\x00xj\xb2\xb4\xa5\xac\xd9l\xac"
+    b"\xb6\x00\x00\x00\x00IEND\xaeB`\x82"
+)
+
+
+def json_loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2).encode("utf-8")
+
+
+def compile_template(template):
+    formatter = string.Formatter()
+    parts = [
+        (literal, field, spec or "", conversion)
+        for literal, field, spec, conversion in formatter.parse(template)
+    ]
+
+    def render(values):
+        out = []
+        for literal, field, spec, conversion in parts:
+            out.append(literal)
+            if field is not None:
+                value = values.get(field, "")
+                if conversion:
+                    value = formatter.convert_field(value, conversion)
+                out.append(format(value, spec))
+        return "".join(out)
+
+    render.fields = frozenset(field for _, field, _, _ in parts if field is not None)
+    return render
+
+
+def atomic_write(path, data):
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=path.name, suffix=".tmp", delete=False) as tmp:
+        try:
+            tmp.write(data)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    try:
+        os.replace(tmp.name, path)
+    except BaseException:
+        os.unlink(tmp.name)
+        raise
+
+
+def fit_utf8(text, limit=128):
+    encoded = text.encode("utf-8")
+    if len(encoded) <= limit:
+        return text
+    return encoded[:limit].decode("utf-8", errors="ignore")
+
 
 def load_config():
     if CONFIG_PATH.exists():
         try:
-            user_cfg = json.loads(CONFIG_PATH.read_text())
+            user_cfg = json_loads(CONFIG_PATH.read_bytes())
             merged = DEFAULT_CONFIG.copy()
             merged.update(user_cfg)
             merged["privacy"] = {**DEFAULT_CONFIG["privacy"], **user_cfg.get("privacy", {})}
@@ -69,7 +164,7 @@ def load_config():
             return merged
         except Exception:
             pass
-    CONFIG_PATH.write_text(json.dumps(DEFAULT_CONFIG, indent=2))
+    atomic_write(CONFIG_PATH, json_dumps(DEFAULT_CONFIG))
     return DEFAULT_CONFIG
 
 
@@ -77,8 +172,27 @@ def configure_logging():
     handler = RotatingFileHandler(LOG_PATH, maxBytes=500_000, backupCount=2)
     fmt = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s")
     handler.setFormatter(fmt)
-    logging.basicConfig(level=logging.INFO, handlers=[handler])
-    logging.getLogger().addHandler(logging.StreamHandler())
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, handler, logging.StreamHandler())
+    listener.start()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(QueueHandler(log_queue))
+    return listener
+
+
+class ITunesEventSink:
+    # Events are delivered on the RPC thread while it pumps messages, so a plain flag is enough.
+    changed = False
+
+    def OnPlayerPlayEvent(self, track):
+        ITunesEventSink.changed = True
+
+    def OnPlayerStopEvent(self, track):
+        ITunesEventSink.changed = True
+
+    def OnPlayerPlayingTrackChangedEvent(self, track):
+        ITunesEventSink.changed = True
 
 
 class RPCHandler:
@@ -86,38 +200,89 @@ class RPCHandler:
         self.config = config
         self.rpc = Presence(self.config["client_id"])
         self.itunes = None
+        self._track_db_id = None
+        self._track_meta = None
         self.last_track_id = None
         self.cached_artwork_url = FALLBACK_IMAGE
         self.current_track_info = None
         self.rpc_enabled = True
         self.running = True
-        self.play_counts = {}
+        self._shutdown_event = threading.Event()
+        self.play_counts = OrderedDict()
         self.track_started_at = None
         self.track_counted = False
+        self._last_payload_key = None
+        self._last_sent_at = 0
+        self._presence_stale = True
+        self._presence_anchor = None
+        self._artwork_updated = threading.Event()
+        self._pythoncom = None
+        self._win32com = None
+        self._win32event = None
+        self._wake_handle = None
+        self._http = requests.Session()
+        self._http.mount("https://", HTTPAdapter(max_retries=0, pool_connections=2, pool_maxsize=4))
+        self._search_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="artwork-search")
         self.artwork_cache = self._load_artwork_cache()
-        self.artwork_queue = queue.Queue()
+        self._cache_dirty = False
+        self._last_flush = time.monotonic()
+        self._pending_track = None
+        self._pending_lock = threading.Lock()
+        self._artwork_event = threading.Event()
         self.artwork_thread = threading.Thread(target=self._artwork_worker, daemon=True)
         self.artwork_thread.start()
         self.menu_track_info = None
         self.menu_track_seen_at = 0
+        self._details_fn = self._compile_presence_template("details")
+        self._state_fn = self._compile_presence_template("state")
+        self._button_fns = self._compile_buttons()
+        self._button_fields = frozenset().union(*(url_fn.fields for _, url_fn in self._button_fns))
 
     def _log(self, level, msg):
         logging.log(level, msg)
 
+    def _compile_presence_template(self, field):
+        try:
+            return compile_template(self.config["presence_format"][field])
+        except ValueError as exc:
+            self._log(logging.WARNING, f"Invalid presence_format.{field}, using default: {exc}")
+            return compile_template(DEFAULT_CONFIG["presence_format"][field])
+
+    def _compile_buttons(self):
+        compiled = []
+        for button in self.config.get("buttons", [])[:2]:
+            try:
+                compiled.append((button.get("label", "Open"), compile_template(button.get("url_template", ""))))
+            except ValueError as exc:
+                self._log(logging.WARNING, f"Skipping button with invalid url_template: {exc}")
+        return compiled
+
     def _load_artwork_cache(self):
         if ARTWORK_CACHE_PATH.exists():
             try:
-                return json.loads(ARTWORK_CACHE_PATH.read_text())
+                return json_loads(ARTWORK_CACHE_PATH.read_bytes())
             except Exception:
                 return {}
         return {}
 
+    def _artwork_cache_key(self, artist, album, song_name):
+        return f"{self.clean_string(artist)}|{self.clean_string(album)}|{self.clean_string(song_name)}"
+
     def _save_artwork_cache(self):
         try:
-            ARTWORK_CACHE_PATH.write_text(json.dumps(self.artwork_cache, indent=2))
+            atomic_write(ARTWORK_CACHE_PATH, json_dumps(self.artwork_cache))
         except Exception:
             pass
 
+    def flush_artwork_cache(self, force=False):
+        if not self._cache_dirty:
+            return
+        if not force and time.monotonic() - self._last_flush < ARTWORK_CACHE_FLUSH_INTERVAL:
+            return
+        self._cache_dirty = False
+        self._last_flush = time.monotonic()
+        self._save_artwork_cache()
+
     def connect(self):
         try:
             if self.config.get("dry_run"):
@@ -141,35 +306,52 @@ class RPCHandler:
     def clean_string(self, s):
         if not s:
             return ""
-        return "".join(e for e in s.lower() if e.isalnum())
+        return NON_ALNUM_RE.sub("", s.lower())
 
-    def fetch_artwork_url(self, artist, album, song_name):
+    def fetch_artwork_url(self, artist, album, song_name, force=False):
         if not artist or not song_name:
             return FALLBACK_IMAGE
 
-        cache_key = f"{artist}-{album}-{song_name}"
-        if cache_key in self.artwork_cache:
-            return self.artwork_cache[cache_key]
+        cache_key = self._artwork_cache_key(artist, album, song_name)
+        entry = None if force else self.artwork_cache.get(cache_key)
+        if entry is None and not force:
+            # Entries written before keys were normalized use the raw "artist-album-name" form.
+            entry = self.artwork_cache.pop(f"{artist}-{album}-{song_name}", None)
+            if entry is not None:
+                self.artwork_cache[cache_key] = entry
+                self._cache_dirty = True
+        if isinstance(entry, str):
+            return entry
+        if entry and time.time() - entry.get("ts", 0) < ARTWORK_NEGATIVE_TTL:
+            return FALLBACK_IMAGE
+
+        request_failed = False
 
         def request_json(url):
+            nonlocal request_failed
             delay = 0
             for attempt in range(self.config["max_retry"]):
                 if attempt:
-                    time.sleep(delay or self.config["retry_backoff"])
+                    if self._shutdown_event.wait(delay or self.config["retry_backoff"]):
+                        request_failed = True
+                        return None
                     delay = max(delay * self.config["retry_backoff"], self.config["retry_backoff"])
                 try:
-                    resp = requests.get(url, timeout=self.config["request_timeout"])
+                    resp = self._http.get(url, timeout=self.config["request_timeout"])
                     resp.raise_for_status()
                     return resp.json()
                 except Exception as exc:
                     self._log(logging.DEBUG, f"Artwork request failed (attempt {attempt + 1}): {exc}")
+            request_failed = True
             return None
 
         def search_apple_music(search_term, entity_type):
             if not self.config["privacy"].get("network_artwork", True):
                 return None
-            encoded_query = urllib.parse.quote(search_term)
-            url = f"https://itunes.apple.com/search?term={encoded_query}&media=music&entity={entity_type}&limit=5"
+            query = urllib.parse.urlencode(
+                {"term": search_term, "media": "music", "entity": entity_type, "limit": 5}
+            )
+            url = "https://itunes.apple.com/search?" + query
             data = request_json(url)
             if not data or data.get("resultCount", 0) == 0:
                 return None
@@ -180,43 +362,52 @@ class RPCHandler:
                     return result.get("artworkUrl100", "").replace("100x100bb", "600x600bb")
             return None
 
-        image = search_apple_music(f"{artist} {song_name}", "musicTrack")
+        track_search = self._search_pool.submit(search_apple_music, f"{artist} {song_name}", "musicTrack")
+        album_search = self._search_pool.submit(search_apple_music, f"{artist} {album}", "album") if album else None
+        image = track_search.result() or (album_search and album_search.result())
         if image:
             self.artwork_cache[cache_key] = image
-            self._save_artwork_cache()
+            self._cache_dirty = True
             return image
 
-        if album:
-            image = search_apple_music(f"{artist} {album}", "album")
-            if image:
-                self.artwork_cache[cache_key] = image
-                self._save_artwork_cache()
-                return image
-
+        # Only remember a miss when Apple Music actually answered; network errors
+        # and disabled network artwork should be retried on the next play.
+        if self.config["privacy"].get("network_artwork", True) and not request_failed:
+            self.artwork_cache[cache_key] = {"url": FALLBACK_IMAGE, "ts": time.time()}
+            self._cache_dirty = True
         return FALLBACK_IMAGE
 
     def get_track_info(self):
         try:
-            if self.itunes is None:
-                self.itunes = win32com.client.Dispatch("iTunes.Application")
+            itunes = self.itunes
+            if itunes is None:
+                itunes = self.itunes = self._win32com.DispatchWithEvents("iTunes.Application", ITunesEventSink)
+                self._track_db_id = None
 
-            if self.itunes.PlayerState != 1:
+            if itunes.PlayerState != 1:
                 return None
 
-            track = self.itunes.CurrentTrack
-            unique_id = f"{track.Name}-{track.Artist}-{track.Album}"
-
-            return {
-                "id": unique_id,
-                "name": track.Name,
-                "artist": track.Artist,
-                "album": track.Album,
-                "position": self.itunes.PlayerPosition,
-                "duration": track.Duration,
-            }
+            track = itunes.CurrentTrack
+            db_id = track.TrackDatabaseID
+            if db_id != self._track_db_id or self._track_meta is None:
+                name, artist, album = track.Name, track.Artist, track.Album
+                self._track_meta = {
+                    "id": f"{name}-{artist}-{album}",
+                    "name": name,
+                    "artist": artist,
+                    "album": album,
+                    "duration": track.Duration,
+                }
+                self._track_db_id = db_id
+
+            return {**self._track_meta, "position": itunes.PlayerPosition}
+        except self._pythoncom.com_error as exc:
+            self._log(logging.DEBUG, f"Failed to read track info: {exc}")
+            if exc.hresult in DEAD_DISPATCH_HRESULTS:
+                self.itunes = None
+            return None
         except Exception as exc:
             self._log(logging.DEBUG, f"Failed to read track info: {exc}")
-            self.itunes = None
             return None
 
     def toggle_rpc(self):
@@ -225,53 +416,80 @@ class RPCHandler:
             self._log(logging.INFO, "RPC Disabled by user. Clearing status.")
             self._clear_presence()
             self.last_track_id = None
+        self._wake()
 
     def toggle_privacy(self):
         current = self.config["privacy"]["hide_metadata"]
         self.config["privacy"]["hide_metadata"] = not current
-        CONFIG_PATH.write_text(json.dumps(self.config, indent=2))
+        atomic_write(CONFIG_PATH, json_dumps(self.config))
         self._log(logging.INFO, f"Privacy hide_metadata set to {self.config['privacy']['hide_metadata']}")
+        self._invalidate_presence()
 
     def toggle_network_artwork(self):
         current = self.config["privacy"]["network_artwork"]
         self.config["privacy"]["network_artwork"] = not current
-        CONFIG_PATH.write_text(json.dumps(self.config, indent=2))
+        atomic_write(CONFIG_PATH, json_dumps(self.config))
         self._log(logging.INFO, f"Network artwork set to {self.config['privacy']['network_artwork']}")
 
+    def _invalidate_presence(self):
+        self._last_payload_key = None
+        self._presence_stale = True
+        self._wake()
+
     def toggle_dry_run(self):
         current = self.config["dry_run"]
         self.config["dry_run"] = not current
-        CONFIG_PATH.write_text(json.dumps(self.config, indent=2))
+        atomic_write(CONFIG_PATH, json_dumps(self.config))
         self._log(logging.INFO, f"Dry run set to {self.config['dry_run']}")
+        self._invalidate_presence()
+
+    def shutdown(self):
+        self.running = False
+        self._shutdown_event.set()
+        self._artwork_event.set()
+        self._wake()
+        self._search_pool.shutdown(wait=False)
+        self.flush_artwork_cache(force=True)
 
     def refresh_artwork(self):
         if self.current_track_info:
-            self._enqueue_artwork(self.current_track_info)
+            self._enqueue_artwork(self.current_track_info, force=True)
 
     def force_reconnect(self):
         self.connect()
+        self._invalidate_presence()
 
-    def _enqueue_artwork(self, track):
-        try:
-            while not self.artwork_queue.empty():
-                self.artwork_queue.get_nowait()
-        except queue.Empty:
-            pass
-        self.artwork_queue.put(track)
+    def _enqueue_artwork(self, track, force=False):
+        with self._pending_lock:
+            self._pending_track = (track, force)
+        self._artwork_event.set()
 
     def _artwork_worker(self):
         while True:
-            track = self.artwork_queue.get()
-            if track is None:
+            if not self._artwork_event.wait(ARTWORK_CACHE_FLUSH_INTERVAL):
+                self.flush_artwork_cache()
+                continue
+            self._artwork_event.clear()
+            if not self.running:
                 break
+            with self._pending_lock:
+                pending, self._pending_track = self._pending_track, None
+            if pending is None:
+                continue
+            track, force = pending
             try:
-                self.cached_artwork_url = self.fetch_artwork_url(track["artist"], track["album"], track["name"])
+                self.cached_artwork_url = self.fetch_artwork_url(
+                    track["artist"], track["album"], track["name"], force=force
+                )
+                self._artwork_updated.set()
+                self._wake()
+                self.flush_artwork_cache()
             except Exception as exc:
                 self._log(logging.DEBUG, f"Artwork worker error: {exc}")
-            finally:
-                self.artwork_queue.task_done()
 
     def _clear_presence(self):
+        self._last_payload_key = None
+        self._presence_anchor = None
         try:
             if self.config.get("dry_run"):
                 self._log(logging.INFO, "Dry-run: clear presence")
@@ -280,21 +498,23 @@ class RPCHandler:
         except Exception as exc:
             self._log(logging.DEBUG, f"Clear presence failed: {exc}")
 
-    def _build_buttons(self, track):
-        if not self.config.get("buttons_enabled", True):
-            return None
-        safe_values = {}
-        for key, val in track.items():
+    def _encode_track(self, track):
+        encoded = {}
+        for key in self._button_fields:
+            val = track.get(key)
             try:
-                safe_values[key] = urllib.parse.quote_plus(str(val)) if val is not None else ""
+                encoded[key] = urllib.parse.quote_plus(str(val)) if val is not None else ""
             except Exception:
-                safe_values[key] = ""
+                encoded[key] = ""
+        return encoded
+
+    def _build_buttons(self, safe_values):
         buttons = []
-        for button in self.config.get("buttons", [])[:2]:
+        for label, url_fn in self._button_fns:
             try:
-                url = button.get("url_template", "").format(**safe_values)
+                url = url_fn(safe_values)
                 if url:
-                    buttons.append({"label": button.get("label", "Open"), "url": url})
+                    buttons.append({"label": label, "url": url})
             except Exception:
                 continue
         return buttons or None
@@ -327,49 +547,126 @@ class RPCHandler:
             fmt_details = "Listening to music"
             fmt_state = None
         else:
-            fmt_details = self.config["presence_format"]["details"].format(**safe_track, play_text=play_text)
-            fmt_state = self.config["presence_format"]["state"].format(**safe_track, play_text=play_text)
+            values = {**safe_track, "play_text": play_text}
+            fmt_details = self._details_fn(values)
+            fmt_state = self._state_fn(values)
 
         position = safe_track.get("position", 0) or 0
         duration = safe_track.get("duration", 0) or 0
         time_remaining = max(duration - position, 0)
-        end_timestamp = int(time.time() + time_remaining) if duration else None
-        start_timestamp = int(time.time() - position) if duration else None
+        wall = time.time()
+        end_timestamp = int(wall + time_remaining) if duration else None
+        start_timestamp = int(wall - position) if duration else None
+
+        buttons = None
+        if not privacy_on and self.config.get("buttons_enabled", True):
+            buttons = self._build_buttons(self._encode_track(safe_track))
 
         payload = {
-            "details": fmt_details[:128],
-            "state": fmt_state[:128] if fmt_state else None,
+            "details": fit_utf8(fmt_details),
+            "state": fit_utf8(fmt_state) if fmt_state else None,
             "large_image": FALLBACK_IMAGE if privacy_on else self.cached_artwork_url,
             "large_text": None if privacy_on else safe_track.get("album"),
             "start": start_timestamp,
             "end": end_timestamp,
-            "buttons": None if privacy_on else self._build_buttons(safe_track),
+            "buttons": buttons,
         }
 
+        payload_key = (
+            payload["details"],
+            payload["state"],
+            payload["large_image"],
+            payload["large_text"],
+            tuple((b["label"], b["url"]) for b in buttons or ()),
+        )
+        if payload_key == self._last_payload_key and time.monotonic() - self._last_sent_at < PRESENCE_RESEND_INTERVAL:
+            self._presence_stale = False
+            return
+
         try:
             if self.config.get("dry_run"):
                 self._log(logging.INFO, f"Dry-run payload: {payload}")
-                return
-            self.rpc.update(**{k: v for k, v in payload.items() if v is not None})
+            else:
+                self.rpc.update(**{k: v for k, v in payload.items() if v is not None})
+            self._last_payload_key = payload_key
+            self._last_sent_at = time.monotonic()
+            self._presence_anchor = self._last_sent_at - position
+            self._presence_stale = False
         except Exception as exc:
             self._log(logging.WARNING, f"Presence update failed: {exc}")
             self.ensure_connected()
 
+    def _count_play(self, track_id):
+        self.play_counts[track_id] = self.play_counts.get(track_id, 0) + 1
+        self.play_counts.move_to_end(track_id)
+        if len(self.play_counts) > PLAY_COUNTS_MAX:
+            self.play_counts.popitem(last=False)
+
+    def _play_count_threshold(self, track):
+        return min(
+            self.config["play_count_threshold_seconds"],
+            track["duration"] * self.config["play_count_threshold_fraction"],
+        )
+
+    def _next_wake_timeout(self, track):
+        if self.itunes is None:
+            return self.config["refresh_interval"]
+        timeout = self.config["event_fallback_interval"]
+        if track and not self.track_counted and self.track_started_at:
+            remaining = self._play_count_threshold(track) - (time.monotonic() - self.track_started_at)
+            timeout = min(timeout, remaining)
+        elif not track and self.menu_track_info:
+            timeout = min(timeout, MENU_TRACK_TTL - (time.monotonic() - self.menu_track_seen_at))
+        return max(timeout, MIN_WAIT_INTERVAL)
+
+    def _wake(self):
+        if self._wake_handle is not None:
+            self._win32event.SetEvent(self._wake_handle)
+
+    def _wait_for_change(self, timeout):
+        # An event may already have been dispatched during a COM call made while reading state.
+        if ITunesEventSink.changed:
+            return
+        win32event = self._win32event
+        deadline = time.monotonic() + timeout
+        while self.running:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            rc = win32event.MsgWaitForMultipleObjects(
+                [self._wake_handle], False, int(remaining * 1000), win32event.QS_ALLINPUT
+            )
+            if rc != win32event.WAIT_OBJECT_0 + 1:
+                break
+            self._pythoncom.PumpWaitingMessages()
+            if ITunesEventSink.changed:
+                break
+
     def loop(self):
+        import pythoncom
+        import win32com.client
+        import win32event
+
+        self._pythoncom = pythoncom
+        self._win32com = win32com.client
+        self._win32event = win32event
         pythoncom.CoInitialize()
+        self._wake_handle = win32event.CreateEvent(None, False, False, None)
         while self.running:
+            ITunesEventSink.changed = False
             try:
                 if not self.rpc_enabled:
-                    time.sleep(self.config["idle_interval"])
+                    self._wait_for_change(self.config["idle_interval"])
                     continue
 
+                now = time.monotonic()
                 track = self.get_track_info()
                 self.current_track_info = track
                 if track:
                     self.menu_track_info = track
-                    self.menu_track_seen_at = time.time()
+                    self.menu_track_seen_at = now
                 else:
-                    if time.time() - self.menu_track_seen_at > 10:
+                    if now - self.menu_track_seen_at > MENU_TRACK_TTL:
                         self.menu_track_info = None
 
                 if track:
@@ -377,40 +674,55 @@ class RPCHandler:
                         self.cached_artwork_url = FALLBACK_IMAGE
                         self._enqueue_artwork(track)
                         self.last_track_id = track["id"]
-                        self.track_started_at = time.time()
+                        self.track_started_at = now
                         self.track_counted = False
+                        self._presence_stale = True
 
                     if not self.track_counted and self.track_started_at:
-                        time_listened = time.time() - self.track_started_at
-                        threshold = min(
-                            self.config["play_count_threshold_seconds"],
-                            track["duration"] * self.config["play_count_threshold_fraction"],
-                        )
-                        if time_listened >= threshold:
-                            self.play_counts[track["id"]] = self.play_counts.get(track["id"], 0) + 1
+                        time_listened = now - self.track_started_at
+                        if time_listened >= self._play_count_threshold(track):
+                            self._count_play(track["id"])
                             self.track_counted = True
+                            self._presence_stale = True
+
+                    if self._artwork_updated.is_set():
+                        self._artwork_updated.clear()
+                        self._presence_stale = True
 
-                    self._update_presence(track)
+                    # Discord extrapolates from start/end, so only a seek needs new timestamps.
+                    if self._presence_anchor is not None:
+                        drift = abs(now - self._presence_anchor - (track["position"] or 0))
+                        if drift > SEEK_TOLERANCE:
+                            self._last_payload_key = None
+                            self._presence_stale = True
+
+                    # Heartbeat on the fallback wake so a restarted Discord gets presence back.
+                    if now - self._last_sent_at >= PRESENCE_RESEND_INTERVAL:
+                        self._presence_stale = True
+
+                    if self._presence_stale:
+                        self._update_presence(track)
                 else:
                     self._clear_presence()
                     self.last_track_id = None
                     self.track_started_at = None
                     self.track_counted = False
 
-                time.sleep(self.config["refresh_interval"])
+                self._wait_for_change(self._next_wake_timeout(track))
 
             except Exception as e:
                 self._log(logging.WARNING, f"Loop error: {e}")
-                time.sleep(self.config["idle_interval"])
+                self._wait_for_change(self.config["idle_interval"])
 
 
 config = load_config()
-configure_logging()
+log_listener = configure_logging()
 handler = RPCHandler(config)
 
 def get_menu_items():
     """Generates the menu items dynamically every time you right-click."""
-    
+    import pystray
+
     items = []
     track = handler.menu_track_info if handler.rpc_enabled else None
 
@@ -457,18 +769,12 @@ def get_menu_items():
     return items
 
 def create_image():
-    width = 64
-    height = 64
-    color1 = "black"
-    color2 = "white"
-    image = Image.new('RGB', (width, height), color1)
-    dc = ImageDraw.Draw(image)
-    dc.rectangle((width // 2, 0, width, height // 2), fill=color2)
-    dc.rectangle((0, height // 2, width // 2, height), fill=color2)
-    return image
+    from PIL import Image
+
+    return Image.open(io.BytesIO(ICON_PNG))
 
 def quit_action(icon, item):
-    handler.running = False
+    handler.shutdown()
     icon.stop()
 
 def run_background_rpc():
@@ -478,6 +784,11 @@ def run_background_rpc():
 if __name__ == '__main__':
     rpc_thread = threading.Thread(target=run_background_rpc)
     rpc_thread.start()
+
+    import pystray
+
     icon = pystray.Icon("iTunesRPC", create_image(), "iTunes RPC", menu=pystray.Menu(get_menu_items))
 
-    icon.run()
\ No newline at end of file
+    icon.run()
+    rpc_thread.join()
+    log_listener.stop()